@@ -1,14 +1,369 @@
 #include "exif_handler.h"
+#include "logging.h"
 #include <QDebug>
+#include <QFile>
 #include <QFileInfo>
 #include <QHash>
+#include <QSet>
+#include <QtEndian>
 #include <QTimeZone>
+#include <algorithm>
 #include <cmath>
+#include <cstring>
 #include <exiv2/exiv2.hpp>
 
 namespace lyp {
 
-QString ExifHandler::s_lastError;
+thread_local QString ExifHandler::s_lastError;
+
+namespace {
+
+// The Exif segment sits near the start of a JPEG; never look further
+constexpr qint64 kJpegHeaderScanSize = 128 * 1024;
+
+/**
+ * @brief Location of the Exif APP1 payload inside a JPEG.
+ */
+struct JpegExifSegment {
+  qint64 offset = 0; // Offset of the TIFF header
+  qint64 size = 0;   // Bytes reserved for the TIFF data
+};
+
+// Walk the JPEG markers up to the first scan looking for "Exif\0\0" APP1
+std::optional<JpegExifSegment> findJpegExifSegment(const uchar *data,
+                                                   qint64 size) {
+  if (size < 4 || data[0] != 0xFF || data[1] != 0xD8) {
+    return std::nullopt;
+  }
+
+  qint64 pos = 2;
+  while (pos + 4 <= size) {
+    if (data[pos] != 0xFF) {
+      return std::nullopt;
+    }
+    uchar marker = data[pos + 1];
+    if (marker == 0xFF) {
+      ++pos; // Fill byte
+      continue;
+    }
+    if (marker == 0xDA || marker == 0xD9) {
+      return std::nullopt; // Start of scan or end of image
+    }
+    if (marker == 0x01 || (marker >= 0xD0 && marker <= 0xD7)) {
+      pos += 2; // Markers without a length field
+      continue;
+    }
+
+    qint64 length = (data[pos + 2] << 8) | data[pos + 3];
+    if (length < 2) {
+      return std::nullopt;
+    }
+    if (marker == 0xE1 && length >= 8 && pos + 10 <= size &&
+        std::memcmp(data + pos + 4, "Exif\0\0", 6) == 0) {
+      return JpegExifSegment{pos + 10, length - 8};
+    }
+    pos += 2 + length;
+  }
+  return std::nullopt;
+}
+
+quint16 readU16(const uchar *p, bool littleEndian) {
+  return littleEndian ? qFromLittleEndian<quint16>(p)
+                      : qFromBigEndian<quint16>(p);
+}
+
+quint32 readU32(const uchar *p, bool littleEndian) {
+  return littleEndian ? qFromLittleEndian<quint32>(p)
+                      : qFromBigEndian<quint32>(p);
+}
+
+/**
+ * @brief Result of looking up a tag in a TIFF IFD.
+ */
+struct IfdLookup {
+  std::optional<qint64> entry; // Offset of the tag's 12-byte entry
+  bool truncated = false;      // The IFD runs past the buffer
+};
+
+// Find a tag in a TIFF IFD. A truncated IFD is reported separately so the
+// caller can tell "tag absent" from "could not look"
+IfdLookup findIfdEntry(const uchar *tiff, qint64 size, bool littleEndian,
+                       qint64 ifdOffset, quint16 tag) {
+  IfdLookup lookup;
+  if (ifdOffset + 2 > size) {
+    lookup.truncated = true;
+    return lookup;
+  }
+  quint16 count = readU16(tiff + ifdOffset, littleEndian);
+  qint64 entry = ifdOffset + 2;
+  for (quint16 i = 0; i < count; ++i, entry += 12) {
+    if (entry + 12 > size) {
+      lookup.truncated = true;
+      return lookup;
+    }
+    if (readU16(tiff + entry, littleEndian) == tag) {
+      lookup.entry = entry;
+      return lookup;
+    }
+  }
+  return lookup;
+}
+
+/**
+ * @brief Fields read by the JPEG fast path.
+ */
+struct JpegQuickMetadata {
+  std::optional<QString> dateTimeOriginal; // Raw EXIF date string
+  bool hasGps = false;
+};
+
+bool isJpegFile(const QString &filePath) {
+  const QString ext = QFileInfo(filePath).suffix().toLower();
+  return ext == "jpg" || ext == "jpeg";
+}
+
+// Read DateTimeOriginal and GPS presence from the start of a JPEG without
+// parsing the rest of the metadata. Returns nullopt if there is no Exif
+// segment, or if any part of it needed lies outside the header read, so
+// that the caller falls back to exiv2.
+std::optional<JpegQuickMetadata> fastReadJpegMetadata(const QString &filePath) {
+  QFile file(filePath);
+  if (!file.open(QIODevice::ReadOnly)) {
+    return std::nullopt;
+  }
+  const QByteArray head = file.read(kJpegHeaderScanSize);
+  const auto *data = reinterpret_cast<const uchar *>(head.constData());
+
+  auto segment = findJpegExifSegment(data, head.size());
+  if (!segment.has_value() ||
+      segment->offset + segment->size > head.size()) {
+    return std::nullopt;
+  }
+  const uchar *tiff = data + segment->offset;
+  const qint64 size = segment->size;
+  if (size < 8) {
+    return std::nullopt;
+  }
+
+  // TIFF header: byte order, magic, offset of IFD0
+  bool littleEndian;
+  if (tiff[0] == 'I' && tiff[1] == 'I') {
+    littleEndian = true;
+  } else if (tiff[0] == 'M' && tiff[1] == 'M') {
+    littleEndian = false;
+  } else {
+    return std::nullopt;
+  }
+
+  const qint64 ifd0 = readU32(tiff + 4, littleEndian);
+  if (ifd0 + 2 > size) {
+    return std::nullopt;
+  }
+  JpegQuickMetadata metadata;
+
+  // IFD0 -> GPSInfoIFDPointer (0x8825) -> GPSLatitude (0x0002) and
+  // GPSLongitude (0x0004)
+  IfdLookup gpsPointer = findIfdEntry(tiff, size, littleEndian, ifd0, 0x8825);
+  if (gpsPointer.truncated) {
+    return std::nullopt;
+  }
+  if (gpsPointer.entry.has_value()) {
+    const qint64 gpsIfd = readU32(tiff + *gpsPointer.entry + 8, littleEndian);
+    IfdLookup latitude = findIfdEntry(tiff, size, littleEndian, gpsIfd, 0x0002);
+    IfdLookup longitude =
+        findIfdEntry(tiff, size, littleEndian, gpsIfd, 0x0004);
+    if (latitude.truncated || longitude.truncated) {
+      return std::nullopt;
+    }
+    metadata.hasGps =
+        latitude.entry.has_value() && longitude.entry.has_value();
+  }
+
+  // IFD0 -> ExifIFDPointer (0x8769) -> DateTimeOriginal (0x9003)
+  IfdLookup exifPointer =
+      findIfdEntry(tiff, size, littleEndian, ifd0, 0x8769);
+  if (exifPointer.truncated) {
+    return std::nullopt;
+  }
+  if (!exifPointer.entry.has_value()) {
+    return metadata;
+  }
+  IfdLookup date = findIfdEntry(
+      tiff, size, littleEndian,
+      readU32(tiff + *exifPointer.entry + 8, littleEndian), 0x9003);
+  if (date.truncated) {
+    return std::nullopt;
+  }
+  if (!date.entry.has_value()) {
+    return metadata;
+  }
+  const qint64 dateEntry = *date.entry;
+
+  // ASCII "YYYY:MM:DD HH:MM:SS\0"; longer than 4 bytes, so stored by offset
+  quint16 type = readU16(tiff + dateEntry + 2, littleEndian);
+  quint32 count = readU32(tiff + dateEntry + 4, littleEndian);
+  if (type != 2 || count < 20) {
+    return metadata;
+  }
+  qint64 valueOffset = readU32(tiff + dateEntry + 8, littleEndian);
+  if (valueOffset + 19 > size) {
+    return std::nullopt;
+  }
+  metadata.dateTimeOriginal = QString::fromLatin1(
+      reinterpret_cast<const char *>(tiff + valueOffset), 19);
+  return metadata;
+}
+
+// Capture time from the first date tag that holds a valid date
+std::optional<QDateTime> findExifTimestamp(const Exiv2::ExifData &exifData) {
+  // Try DateTimeOriginal first, then CreateDate
+  static const char *const dateKeys[] = {
+      "Exif.Photo.DateTimeOriginal", "Exif.Image.DateTimeOriginal",
+      "Exif.Photo.DateTimeDigitized", "Exif.Image.DateTime"};
+
+  for (const char *key : dateKeys) {
+    auto it = exifData.findKey(Exiv2::ExifKey(key));
+    if (it != exifData.end()) {
+      auto dt = ExifHandler::parseExifDateTime(
+          QString::fromStdString(it->toString()));
+      if (dt.has_value()) {
+        return dt;
+      }
+    }
+  }
+  return std::nullopt;
+}
+
+bool hasExifGps(const Exiv2::ExifData &exifData) {
+  auto latIt = exifData.findKey(Exiv2::ExifKey("Exif.GPSInfo.GPSLatitude"));
+  auto lonIt = exifData.findKey(Exiv2::ExifKey("Exif.GPSInfo.GPSLongitude"));
+  return latIt != exifData.end() && lonIt != exifData.end();
+}
+
+/**
+ * @brief Keys and constant values for the GPS tags writeGpsData() sets.
+ *
+ * Every write sets the same handful of tags, so the keys are parsed and the
+ * fixed values created once instead of on every call.
+ */
+struct GpsWriteTemplate {
+  Exiv2::ExifKey versionKey{"Exif.GPSInfo.GPSVersionID"};
+  Exiv2::ExifKey latitudeRefKey{"Exif.GPSInfo.GPSLatitudeRef"};
+  Exiv2::ExifKey latitudeKey{"Exif.GPSInfo.GPSLatitude"};
+  Exiv2::ExifKey longitudeRefKey{"Exif.GPSInfo.GPSLongitudeRef"};
+  Exiv2::ExifKey longitudeKey{"Exif.GPSInfo.GPSLongitude"};
+  Exiv2::ExifKey altitudeRefKey{"Exif.GPSInfo.GPSAltitudeRef"};
+  Exiv2::ExifKey altitudeKey{"Exif.GPSInfo.GPSAltitude"};
+
+  Exiv2::DataValue version{Exiv2::unsignedByte};
+  Exiv2::AsciiValue north{"N"};
+  Exiv2::AsciiValue south{"S"};
+  Exiv2::AsciiValue east{"E"};
+  Exiv2::AsciiValue west{"W"};
+  Exiv2::DataValue aboveSeaLevel{Exiv2::unsignedByte};
+  Exiv2::DataValue belowSeaLevel{Exiv2::unsignedByte};
+
+  GpsWriteTemplate() {
+    version.read("2 3 0 0");
+    aboveSeaLevel.read("0");
+    belowSeaLevel.read("1");
+  }
+};
+
+const GpsWriteTemplate &gpsWriteTemplate() {
+  static const GpsWriteTemplate gps;
+  return gps;
+}
+
+// Set a tag without going through ExifData::operator[], which parses the
+// key string on every call
+void setExifValue(Exiv2::ExifData &exifData, const Exiv2::ExifKey &key,
+                  const Exiv2::Value &value) {
+  auto it = exifData.findKey(key);
+  if (it == exifData.end()) {
+    exifData.add(key, &value);
+  } else {
+    it->setValue(&value);
+  }
+}
+
+// Convert decimal degrees to DMS rationals. Scale once to 1/10000 arc
+// seconds, then split with integer division.
+Exiv2::URationalValue toDmsValue(double decimal) {
+  constexpr int64_t kSecScale = 10000;
+  const auto total =
+      static_cast<int64_t>(std::abs(decimal) * 3600.0 * kSecScale);
+  const int64_t deg = total / (3600 * kSecScale);
+  const int64_t rem = total % (3600 * kSecScale);
+  Exiv2::URationalValue value;
+  value.value_ = {{static_cast<uint32_t>(deg), 1},
+                  {static_cast<uint32_t>(rem / (60 * kSecScale)), 1},
+                  {static_cast<uint32_t>(rem % (60 * kSecScale)), kSecScale}};
+  return value;
+}
+
+// Rewrite the Exif segment of a JPEG in place when the new data fits in
+// it. This avoids copying the image data, which is what writeMetadata()
+// does. Returns false if the file was left untouched.
+bool patchJpegExifInPlace(const QString &filePath, Exiv2::ExifData &exifData,
+                          Exiv2::ByteOrder byteOrder) {
+  QFile file(filePath);
+  if (!file.open(QIODevice::ReadWrite)) {
+    return false;
+  }
+
+  const qint64 mapSize = std::min(file.size(), kJpegHeaderScanSize);
+  uchar *mapped = file.map(0, mapSize);
+  uchar *data = mapped;
+
+  // Some filesystems cannot be mapped; patch a copy of the header instead
+  // and write the segment back with a positioned write
+  QByteArray header;
+  if (!mapped) {
+    header = file.read(mapSize);
+    if (header.size() != mapSize) {
+      return false;
+    }
+    data = reinterpret_cast<uchar *>(header.data());
+  }
+
+  bool patched = false;
+  auto segment = findJpegExifSegment(data, mapSize);
+  if (segment.has_value() && segment->offset + segment->size <= mapSize) {
+    uchar *tiff = data + segment->offset;
+
+    // Encode against the existing data like exiv2's JPEG writer does, so
+    // unchanged parts keep their layout
+    Exiv2::DataBuf current(tiff, segment->size);
+    Exiv2::Blob blob;
+    Exiv2::WriteMethod method = Exiv2::ExifParser::encode(
+        blob, current.c_data(), current.size(), byteOrder, exifData);
+
+    const Exiv2::byte *newData = current.c_data();
+    size_t newSize = current.size();
+    if (method == Exiv2::wmIntrusive) {
+      newData = blob.data();
+      newSize = blob.size();
+    }
+
+    if (newSize > 0 && newSize <= static_cast<size_t>(segment->size)) {
+      std::memcpy(tiff, newData, newSize);
+      std::memset(tiff + newSize, 0, segment->size - newSize);
+      patched = true;
+    }
+  }
+
+  if (mapped) {
+    file.unmap(mapped);
+  } else if (patched) {
+    patched = file.seek(segment->offset) &&
+              file.write(reinterpret_cast<const char *>(data) + segment->offset,
+                         segment->size) == segment->size;
+  }
+  return patched;
+}
+
+} // namespace
 
 // Format support database based on exiv2 manual
 // Key: extension (lowercase), Value: {level, warning}
@@ -89,71 +444,58 @@ const QStringList &ExifHandler::supportedExtensions() {
 }
 
 bool ExifHandler::isSupported(const QString &path) {
+  // Hash lookup; this runs for every file found when scanning folders
+  static const QSet<QString> extensionSet(supportedExtensions().cbegin(),
+                                          supportedExtensions().cend());
   QString ext = QFileInfo(path).suffix().toLower();
-  return supportedExtensions().contains(ext);
+  return extensionSet.contains(ext);
 }
 
-std::optional<QDateTime>
-ExifHandler::getPhotoTimestamp(const QString &filePath,
-                               double timeOffsetSeconds) {
-  s_lastError.clear();
-
-  try {
-    auto image = Exiv2::ImageFactory::open(filePath.toStdString());
-    image->readMetadata();
+std::optional<QDateTime> ExifHandler::parseExifDateTime(const QString &value) {
+  // EXIF format: "YYYY:MM:DD HH:MM:SS", possibly followed by extra text
+  QDateTime dt = QDateTime::fromString(value.left(19), "yyyy:MM:dd HH:mm:ss");
+  if (!dt.isValid()) {
+    return std::nullopt;
+  }
 
-    const Exiv2::ExifData &exifData = image->exifData();
-    if (exifData.empty()) {
-      s_lastError = "No EXIF data found";
-      return std::nullopt;
-    }
+  // Keep the camera clock as is; the time offset is applied when matching
+  dt.setTimeZone(QTimeZone::utc());
+  return dt;
+}
 
-    // Try DateTimeOriginal first, then CreateDate
-    QStringList dateKeys = {
-        "Exif.Photo.DateTimeOriginal", "Exif.Image.DateTimeOriginal",
-        "Exif.Photo.DateTimeDigitized", "Exif.Image.DateTime"};
-
-    for (const QString &key : dateKeys) {
-      auto it = exifData.findKey(Exiv2::ExifKey(key.toStdString()));
-      if (it != exifData.end()) {
-        QString dateStr = QString::fromStdString(it->toString());
-        // EXIF format: "YYYY:MM:DD HH:MM:SS"
-        QDateTime dt = QDateTime::fromString(dateStr, "yyyy:MM:dd HH:mm:ss");
-        if (dt.isValid()) {
-          // Convert from local camera time to UTC
-          dt.setTimeZone(QTimeZone::utc());
-          if (timeOffsetSeconds != 0.0) {
-            dt = dt.addSecs(static_cast<qint64>(-timeOffsetSeconds));
-          }
-          return dt;
-        }
+PhotoMetadata ExifHandler::readPhotoMetadata(const QString &filePath) {
+  s_lastError.clear();
+  PhotoMetadata metadata;
+
+  // Fast path for JPEGs: GPS presence and DateTimeOriginal both come from
+  // the IFDs at the start of the file
+  if (isJpegFile(filePath)) {
+    auto quick = fastReadJpegMetadata(filePath);
+    if (quick.has_value() && quick->dateTimeOriginal.has_value()) {
+      metadata.captureTime = parseExifDateTime(*quick->dateTimeOriginal);
+      if (metadata.captureTime.has_value()) {
+        metadata.hasGps = quick->hasGps;
+        return metadata;
       }
     }
-
-    s_lastError = "No valid timestamp found in EXIF";
-    return std::nullopt;
-
-  } catch (const Exiv2::Error &e) {
-    s_lastError = QString("Exiv2 error: %1").arg(e.what());
-    qWarning() << s_lastError;
-    return std::nullopt;
   }
-}
 
-bool ExifHandler::hasGpsData(const QString &filePath) {
   try {
     auto image = Exiv2::ImageFactory::open(filePath.toStdString());
     image->readMetadata();
 
     const Exiv2::ExifData &exifData = image->exifData();
-    auto latIt = exifData.findKey(Exiv2::ExifKey("Exif.GPSInfo.GPSLatitude"));
-    auto lonIt = exifData.findKey(Exiv2::ExifKey("Exif.GPSInfo.GPSLongitude"));
-
-    return latIt != exifData.end() && lonIt != exifData.end();
+    metadata.captureTime = findExifTimestamp(exifData);
+    metadata.hasGps = hasExifGps(exifData);
+    if (!metadata.captureTime.has_value()) {
+      s_lastError = "No valid timestamp found in EXIF";
+    }
 
-  } catch (const Exiv2::Error &) {
-    return false;
+  } catch (const Exiv2::Error &e) {
+    s_lastError = QString("Exiv2 error: %1").arg(e.what());
+    qCDebug(lcPhoto) << filePath << s_lastError;
   }
+  return metadata;
 }
 
 std::optional<GpsCoord> ExifHandler::readGpsData(const QString &filePath) {
@@ -229,60 +571,45 @@ bool ExifHandler::writeGpsData(const QString &filePath, double latitude,
     image->readMetadata();
 
     Exiv2::ExifData &exifData = image->exifData();
-
-    // Helper to convert decimal degrees to DMS rational
-    auto toRational = [](double decimal) -> std::vector<Exiv2::Rational> {
-      decimal = std::abs(decimal);
-      int deg = static_cast<int>(decimal);
-      double minDecimal = (decimal - deg) * 60.0;
-      int min = static_cast<int>(minDecimal);
-      double sec = (minDecimal - min) * 60.0;
-      // Use high precision for seconds (multiply by 10000)
-      int secNumerator = static_cast<int>(sec * 10000);
-      return {{deg, 1}, {min, 1}, {secNumerator, 10000}};
-    };
+    const GpsWriteTemplate &gps = gpsWriteTemplate();
 
     // Set GPS Version ID
-    Exiv2::Value::UniquePtr versionValue =
-        Exiv2::Value::create(Exiv2::unsignedByte);
-    versionValue->read("2 3 0 0");
-    exifData["Exif.GPSInfo.GPSVersionID"] = *versionValue;
+    setExifValue(exifData, gps.versionKey, gps.version);
 
     // Set latitude
-    auto latRationals = toRational(latitude);
-    exifData["Exif.GPSInfo.GPSLatitudeRef"] = (latitude >= 0) ? "N" : "S";
-    Exiv2::URationalValue latValue;
-    for (const auto &r : latRationals) {
-      latValue.value_.push_back(std::make_pair(
-          static_cast<uint32_t>(r.first), static_cast<uint32_t>(r.second)));
-    }
-    exifData["Exif.GPSInfo.GPSLatitude"] = latValue;
+    setExifValue(exifData, gps.latitudeRefKey,
+                 (latitude >= 0) ? gps.north : gps.south);
+    setExifValue(exifData, gps.latitudeKey, toDmsValue(latitude));
 
     // Set longitude
-    auto lonRationals = toRational(longitude);
-    exifData["Exif.GPSInfo.GPSLongitudeRef"] = (longitude >= 0) ? "E" : "W";
-    Exiv2::URationalValue lonValue;
-    for (const auto &r : lonRationals) {
-      lonValue.value_.push_back(std::make_pair(
-          static_cast<uint32_t>(r.first), static_cast<uint32_t>(r.second)));
-    }
-    exifData["Exif.GPSInfo.GPSLongitude"] = lonValue;
+    setExifValue(exifData, gps.longitudeRefKey,
+                 (longitude >= 0) ? gps.east : gps.west);
+    setExifValue(exifData, gps.longitudeKey, toDmsValue(longitude));
 
     // Set elevation if provided
     if (elevation.has_value()) {
       double alt = elevation.value();
-      exifData["Exif.GPSInfo.GPSAltitudeRef"] = (alt >= 0) ? "0" : "1";
+      setExifValue(exifData, gps.altitudeRefKey,
+                   (alt >= 0) ? gps.aboveSeaLevel : gps.belowSeaLevel);
       int altNumerator = static_cast<int>(std::abs(alt) * 100);
       Exiv2::URationalValue altValue;
       altValue.value_.push_back(
           std::make_pair(static_cast<uint32_t>(altNumerator), 100u));
-      exifData["Exif.GPSInfo.GPSAltitude"] = altValue;
+      setExifValue(exifData, gps.altitudeKey, altValue);
     }
 
-    image->writeMetadata();
+    Exiv2::ByteOrder byteOrder = image->byteOrder();
+    if (byteOrder == Exiv2::invalidByteOrder) {
+      byteOrder = Exiv2::littleEndian;
+    }
+    bool patched = image->imageType() == Exiv2::ImageType::jpeg &&
+                   patchJpegExifInPlace(filePath, exifData, byteOrder);
+    if (!patched) {
+      image->writeMetadata();
+    }
 
-    qInfo() << "Wrote GPS to" << filePath << ":" << latitude << ","
-            << longitude;
+    qCDebug(lcPhoto) << "Wrote GPS to" << filePath << ":" << latitude << ","
+                     << longitude;
     return true;
 
   } catch (const Exiv2::Error &e) {
@@ -302,7 +629,7 @@ bool ExifHandler::writeGpsData(const QString &filePath, double latitude,
     } else {
       s_lastError = QString("Failed to write GPS: %1").arg(errorMsg);
     }
-    qWarning() << s_lastError;
+    qCDebug(lcPhoto) << filePath << s_lastError;
     return false;
   }
 }
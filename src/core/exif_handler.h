@@ -16,6 +16,14 @@ struct GpsCoord {
   std::optional<double> elevation;
 };
 
+/**
+ * @brief Metadata needed to geotag a photo, read in one pass.
+ */
+struct PhotoMetadata {
+  std::optional<QDateTime> captureTime; // Camera clock, no time offset applied
+  bool hasGps = false;
+};
+
 /**
  * @brief Support level for file format metadata editing.
  */
@@ -54,21 +62,19 @@ public:
   static bool isSupported(const QString &path);
 
   /**
-   * @brief Extract capture timestamp from photo EXIF.
-   * @param filePath Path to the photo file
-   * @param timeOffsetSeconds Timezone offset in seconds to apply (positive =
-   * camera ahead of UTC)
-   * @return Capture time in UTC, or invalid QDateTime on failure
+   * @brief Parse an EXIF date string ("YYYY:MM:DD HH:MM:SS").
+   * @param value Date string as stored in EXIF
+   * @return Camera clock time tagged as UTC, or nullopt if the string is not
+   * a valid date
    */
-  static std::optional<QDateTime>
-  getPhotoTimestamp(const QString &filePath, double timeOffsetSeconds = 0.0);
+  static std::optional<QDateTime> parseExifDateTime(const QString &value);
 
   /**
-   * @brief Check if photo already has GPS data in EXIF.
+   * @brief Read capture time and GPS presence with a single metadata parse.
    * @param filePath Path to the photo file
-   * @return true if GPS coordinates exist
+   * @return Metadata; captureTime is nullopt if no valid date was found
    */
-  static bool hasGpsData(const QString &filePath);
+  static PhotoMetadata readPhotoMetadata(const QString &filePath);
 
   /**
    * @brief Read existing GPS coordinates from photo.
@@ -124,7 +130,8 @@ public:
   static bool isRawFormat(const QString &path);
 
 private:
-  static QString s_lastError;
+  // Per thread, since photos are processed on a thread pool
+  static thread_local QString s_lastError;
 };
 
 } // namespace lyp
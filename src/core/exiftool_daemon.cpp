@@ -0,0 +1,127 @@
+#include "exiftool_daemon.h"
+#include <QDebug>
+#include <QProcess>
+#include <QThread>
+
+namespace lyp {
+
+namespace {
+
+constexpr int kStartTimeoutMs = 10000;
+constexpr int kCommandTimeoutMs = 30000;
+constexpr int kShutdownTimeoutMs = 5000;
+
+// Read one channel until the marker shows up, leaving data in buffer
+bool readUntil(QProcess *process, QProcess::ProcessChannel channel,
+               QByteArray &buffer, const QByteArray &marker) {
+  process->setReadChannel(channel);
+  buffer += process->readAll();
+  while (!buffer.contains(marker)) {
+    if (!process->waitForReadyRead(kCommandTimeoutMs)) {
+      return false;
+    }
+    buffer += process->readAll();
+  }
+  return true;
+}
+
+} // namespace
+
+ExifToolDaemon &ExifToolDaemon::instance() {
+  static ExifToolDaemon daemon;
+  return daemon;
+}
+
+ExifToolDaemon::~ExifToolDaemon() { stop(); }
+
+bool ExifToolDaemon::ensureStarted() {
+  if (m_process && m_process->state() == QProcess::Running) {
+    return true;
+  }
+
+  delete m_process;
+  m_process = new QProcess;
+
+  // Commands are read from stdin; file names arrive as UTF-8 lines
+  m_process->start("exiftool", {"-stay_open", "True", "-@", "-",
+                                "-common_args", "-charset", "filename=utf8"});
+
+  if (!m_process->waitForStarted(kStartTimeoutMs)) {
+    m_lastError = QString("Failed to start exiftool: %1")
+                      .arg(m_process->errorString());
+    qWarning() << m_lastError;
+    delete m_process;
+    m_process = nullptr;
+    return false;
+  }
+
+  qInfo() << "Started exiftool daemon";
+  return true;
+}
+
+bool ExifToolDaemon::execute(const QStringList &args, QByteArray *output,
+                             QByteArray *errorOutput) {
+  Q_ASSERT(!m_process || QThread::currentThread() == m_process->thread());
+  m_lastError.clear();
+
+  if (!ensureStarted()) {
+    return false;
+  }
+
+  const int id = ++m_commandId;
+  const QByteArray marker = "{ready" + QByteArray::number(id) + "}";
+
+  QByteArray command;
+  for (const QString &arg : args) {
+    command += arg.toUtf8();
+    command += '\n';
+  }
+  // Echo the marker on stderr as well so both channels can be drained
+  command += "-echo4\n" + marker + "\n";
+  command += "-execute" + QByteArray::number(id) + "\n";
+  m_process->write(command);
+
+  QByteArray out;
+  QByteArray err;
+  if (!readUntil(m_process, QProcess::StandardOutput, out, marker) ||
+      !readUntil(m_process, QProcess::StandardError, err, marker)) {
+    m_lastError = "exiftool did not respond in time";
+    qWarning() << m_lastError;
+    m_process->kill();
+    m_process->waitForFinished(kShutdownTimeoutMs);
+    delete m_process;
+    m_process = nullptr;
+    return false;
+  }
+
+  if (output) {
+    *output = out.left(out.indexOf(marker));
+  }
+  if (errorOutput) {
+    *errorOutput = err.left(err.indexOf(marker));
+  }
+  return true;
+}
+
+void ExifToolDaemon::shutdown() { stop(); }
+
+void ExifToolDaemon::stop() {
+  if (!m_process) {
+    return;
+  }
+  Q_ASSERT(QThread::currentThread() == m_process->thread());
+
+  if (m_process->state() == QProcess::Running) {
+    m_process->write("-stay_open\nFalse\n");
+    m_process->closeWriteChannel();
+    if (!m_process->waitForFinished(kShutdownTimeoutMs)) {
+      m_process->kill();
+      m_process->waitForFinished(kShutdownTimeoutMs);
+    }
+  }
+
+  delete m_process;
+  m_process = nullptr;
+}
+
+} // namespace lyp
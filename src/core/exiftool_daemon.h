@@ -0,0 +1,66 @@
+#pragma once
+
+#include <QByteArray>
+#include <QString>
+#include <QStringList>
+
+class QProcess;
+
+namespace lyp {
+
+/**
+ * @brief Long-lived exiftool process driven through `-stay_open`.
+ *
+ * Starting exiftool costs a Perl interpreter launch per call, which dominates
+ * batch runs. A single process is started on first use and fed commands
+ * through its stdin argfile. QProcess is bound to the thread that created
+ * it, so all calls must come from the thread that started the process;
+ * debug builds assert this. The class does no locking of its own.
+ */
+class ExifToolDaemon {
+public:
+  /**
+   * @brief Get the shared daemon instance.
+   */
+  static ExifToolDaemon &instance();
+
+  ~ExifToolDaemon();
+
+  /**
+   * @brief Run one exiftool command in the daemon.
+   * @param args Arguments for this command (one per line in the argfile)
+   * @param output Receives the command's stdout (without the ready marker)
+   * @param errorOutput Receives the command's stderr (optional)
+   * @return true if the command completed, false on startup failure or timeout
+   */
+  bool execute(const QStringList &args, QByteArray *output,
+               QByteArray *errorOutput = nullptr);
+
+  /**
+   * @brief Ask the daemon to exit and wait for it.
+   *
+   * Safe to call when the daemon is not running; the next execute() will
+   * start a new process.
+   */
+  void shutdown();
+
+  /**
+   * @brief Get the last error message.
+   * @return Error message or empty string
+   */
+  QString lastError() const { return m_lastError; }
+
+private:
+  ExifToolDaemon() = default;
+  ExifToolDaemon(const ExifToolDaemon &) = delete;
+  ExifToolDaemon &operator=(const ExifToolDaemon &) = delete;
+
+  bool ensureStarted();
+  void stop();
+
+  QProcess *m_process = nullptr;
+  int m_commandId = 0;
+  QString m_lastError;
+};
+
+} // namespace lyp
@@ -1,6 +1,11 @@
 #include "exiftool_writer.h"
+#include "exiftool_daemon.h"
+#include "logging.h"
 #include <QDebug>
-#include <QProcess>
+#include <QDir>
+#include <QJsonArray>
+#include <QJsonDocument>
+#include <QJsonObject>
 #include <QStandardPaths>
 
 namespace lyp {
@@ -59,28 +64,83 @@ bool ExifToolWriter::writeGpsData(const QString &filePath, double latitude,
 
   args << filePath;
 
-  // Execute exiftool
-  QProcess process;
-  process.start("exiftool", args);
-
-  if (!process.waitForFinished(30000)) { // 30 second timeout
-    s_lastError = QString("exiftool timed out for %1").arg(filePath);
-    process.kill();
+  // Execute exiftool through the shared stay_open process
+  ExifToolDaemon &daemon = ExifToolDaemon::instance();
+  QByteArray output;
+  QByteArray errorOutput;
+  if (!daemon.execute(args, &output, &errorOutput)) {
+    s_lastError =
+        QString("exiftool failed for %1: %2").arg(filePath, daemon.lastError());
     return false;
   }
 
-  if (process.exitCode() != 0) {
-    QString stderr = QString::fromUtf8(process.readAllStandardError());
-    s_lastError = QString("exiftool failed: %1").arg(stderr.trimmed());
-    qWarning() << s_lastError;
+  // The process stays alive, so success is read from the summary line
+  if (!output.contains("1 image files updated") &&
+      !output.contains("1 image files unchanged")) {
+    QString errorText = QString::fromUtf8(errorOutput).trimmed();
+    if (errorText.isEmpty()) {
+      errorText = QString::fromUtf8(output).trimmed();
+    }
+    s_lastError = QString("exiftool failed: %1").arg(errorText);
+    qCDebug(lcPhoto) << filePath << s_lastError;
     return false;
   }
 
-  qInfo() << "exiftool wrote GPS to" << filePath << ":" << latitude << ","
-          << longitude;
+  qCDebug(lcPhoto) << "exiftool wrote GPS to" << filePath << ":" << latitude
+                   << "," << longitude;
   return true;
 }
 
+QHash<QString, PhotoMetadata>
+ExifToolWriter::readMetadata(const QStringList &filePaths) {
+  QHash<QString, PhotoMetadata> result;
+  if (filePaths.isEmpty() || !isAvailable()) {
+    return result;
+  }
+
+  // JSON output with numeric values; -fast2 skips maker notes and trailers,
+  // and only the tags used below are extracted
+  QStringList args = {"-j",
+                      "-n",
+                      "-fast2",
+                      "-DateTimeOriginal",
+                      "-CreateDate",
+                      "-ModifyDate",
+                      "-GPSLatitude",
+                      "-GPSLongitude"};
+  args << filePaths;
+
+  QByteArray output;
+  if (!ExifToolDaemon::instance().execute(args, &output)) {
+    qWarning() << "exiftool metadata read failed:"
+               << ExifToolDaemon::instance().lastError();
+    return result;
+  }
+
+  const QJsonArray entries = QJsonDocument::fromJson(output).array();
+  for (const QJsonValue &entry : entries) {
+    const QJsonObject obj = entry.toObject();
+
+    PhotoMetadata metadata;
+    for (const char *key : {"DateTimeOriginal", "CreateDate", "ModifyDate"}) {
+      metadata.captureTime =
+          ExifHandler::parseExifDateTime(obj.value(key).toString());
+      if (metadata.captureTime.has_value()) {
+        break;
+      }
+    }
+    metadata.hasGps =
+        obj.contains("GPSLatitude") && obj.contains("GPSLongitude");
+
+    result.insert(QDir::cleanPath(obj.value("SourceFile").toString()),
+                  metadata);
+  }
+
+  qInfo() << "exiftool read metadata for" << result.size() << "of"
+          << filePaths.size() << "files";
+  return result;
+}
+
 QString ExifToolWriter::lastError() { return s_lastError; }
 
 } // namespace lyp
@@ -1,6 +1,9 @@
 #pragma once
 
+#include "exif_handler.h"
+#include <QHash>
 #include <QString>
+#include <QStringList>
 #include <optional>
 
 namespace lyp {
@@ -9,6 +12,8 @@ namespace lyp {
  * @brief Writer for GPS data using external exiftool command.
  *
  * Used for BMFF formats (HEIC, AVIF, CR3, JXL) that exiv2 can't write to.
+ * Metadata for these formats is read through exiftool as well, batched into
+ * a single command.
  */
 class ExifToolWriter {
 public:
@@ -30,6 +35,18 @@ public:
                            double longitude,
                            std::optional<double> elevation = std::nullopt);
 
+  /**
+   * @brief Read capture time and GPS presence for many files at once.
+   *
+   * All files are handled by one exiftool command, so the cost is paid once
+   * per batch instead of once per photo.
+   * @param filePaths Paths of the photo files
+   * @return Metadata keyed by cleaned file path; files exiftool failed to
+   * read are missing
+   */
+  static QHash<QString, PhotoMetadata>
+  readMetadata(const QStringList &filePaths);
+
   /**
    * @brief Get the last error message.
    * @return Error message or empty string
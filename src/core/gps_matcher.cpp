@@ -1,65 +1,97 @@
 #include "gps_matcher.h"
 #include <algorithm>
+#include <cmath>
+#include <limits>
 
 namespace lyp {
 
+namespace {
+
+// Elevations are stored as NaN when missing; turn that back into nullopt
+std::optional<double> toElevation(double elevation)
+{
+    if (std::isnan(elevation)) {
+        return std::nullopt;
+    }
+    return elevation;
+}
+
+} // namespace
+
 GpsMatcher::GpsMatcher(const QVector<TrackPoint>& trackpoints, 
                        double maxTimeDiffSeconds,
                        bool forceInterpolate)
-    : m_trackpoints(trackpoints)
-    , m_maxTimeDiff(maxTimeDiffSeconds)
+    : m_maxTimeDiff(maxTimeDiffSeconds)
     , m_forceInterpolate(forceInterpolate)
 {
+    // Keep each field in its own contiguous array for the lookup loops
+    m_times.reserve(trackpoints.size());
+    m_latitudes.reserve(trackpoints.size());
+    m_longitudes.reserve(trackpoints.size());
+    m_elevations.reserve(trackpoints.size());
+    for (const TrackPoint& point : trackpoints) {
+        m_times.append(point.time);
+        m_latitudes.append(point.latitude);
+        m_longitudes.append(point.longitude);
+        m_elevations.append(
+            point.elevation.value_or(std::numeric_limits<double>::quiet_NaN()));
+    }
+    
+    if (!trackpoints.isEmpty()) {
+        m_startTime = trackpoints.first().timestamp();
+        m_endTime = trackpoints.last().timestamp();
+    }
+}
+
+QVector<GpsMatch> GpsMatcher::findGpsForPhotos(const QVector<QDateTime>& photoTimes) const
+{
+    QVector<GpsMatch> results;
+    results.reserve(photoTimes.size());
+    for (const QDateTime& photoTime : photoTimes) {
+        if (!photoTime.isValid()) {
+            results.append(std::nullopt);
+            continue;
+        }
+        results.append(matchAt(photoTime.toMSecsSinceEpoch() / 1000.0));
+    }
+    return results;
 }
 
-std::optional<std::tuple<double, double, std::optional<double>>> 
-GpsMatcher::findGpsForPhoto(const QDateTime& photoTime) const
+GpsMatch GpsMatcher::matchAt(double photoSeconds) const
 {
-    if (m_trackpoints.isEmpty()) {
+    if (m_times.isEmpty()) {
         return std::nullopt;
     }
     
     // Find the two closest trackpoints (before and after)
-    const TrackPoint* before = nullptr;
-    const TrackPoint* after = nullptr;
-    
-    for (int i = 0; i < m_trackpoints.size(); ++i) {
-        if (m_trackpoints[i].timestamp <= photoTime) {
-            before = &m_trackpoints[i];
-        } else {
-            after = &m_trackpoints[i];
-            break;
-        }
-    }
+    int afterIndex = static_cast<int>(
+        std::upper_bound(m_times.cbegin(), m_times.cend(), photoSeconds) - m_times.cbegin());
+    int beforeIndex = afterIndex - 1;
+    int lastIndex = m_times.size() - 1;
     
     // Handle edge cases
-    if (!before) {
+    if (beforeIndex < 0) {
         // Photo is before first trackpoint
-        double timeDiff = m_trackpoints.first().timestamp.toMSecsSinceEpoch() / 1000.0 
-                        - photoTime.toMSecsSinceEpoch() / 1000.0;
+        double timeDiff = m_times[0] - photoSeconds;
         if (m_forceInterpolate || timeDiff <= m_maxTimeDiff) {
-            const auto& p = m_trackpoints.first();
-            return std::make_tuple(p.latitude, p.longitude, p.elevation);
+            return std::make_tuple(m_latitudes[0], m_longitudes[0], toElevation(m_elevations[0]));
         }
         return std::nullopt;
     }
     
-    if (!after) {
+    if (afterIndex > lastIndex) {
         // Photo is after last trackpoint
-        double timeDiff = photoTime.toMSecsSinceEpoch() / 1000.0 
-                        - m_trackpoints.last().timestamp.toMSecsSinceEpoch() / 1000.0;
+        double timeDiff = photoSeconds - m_times[lastIndex];
         if (m_forceInterpolate || timeDiff <= m_maxTimeDiff) {
-            const auto& p = m_trackpoints.last();
-            return std::make_tuple(p.latitude, p.longitude, p.elevation);
+            return std::make_tuple(m_latitudes[lastIndex], m_longitudes[lastIndex],
+                                   toElevation(m_elevations[lastIndex]));
         }
         return std::nullopt;
     }
     
     // Calculate time differences
-    double timeDiffBefore = photoTime.toMSecsSinceEpoch() / 1000.0 
-                          - before->timestamp.toMSecsSinceEpoch() / 1000.0;
-    double timeDiffAfter = after->timestamp.toMSecsSinceEpoch() / 1000.0 
-                         - photoTime.toMSecsSinceEpoch() / 1000.0;
+    double timeDiffBefore = photoSeconds - m_times[beforeIndex];
+    double timeDiffAfter = m_times[afterIndex] - photoSeconds;
     
     // Check if within acceptable time range
     if (!m_forceInterpolate && 
@@ -68,43 +100,39 @@ GpsMatcher::findGpsForPhoto(const QDateTime& photoTime) const
     }
     
     // Linear interpolation
-    double totalTime = after->timestamp.toMSecsSinceEpoch() / 1000.0 
-                     - before->timestamp.toMSecsSinceEpoch() / 1000.0;
+    double totalTime = m_times[afterIndex] - m_times[beforeIndex];
     
     if (totalTime <= 0) {
         // Exact match or very close points
-        return std::make_tuple(before->latitude, before->longitude, before->elevation);
+        return std::make_tuple(m_latitudes[beforeIndex], m_longitudes[beforeIndex],
+                               toElevation(m_elevations[beforeIndex]));
     }
     
     double ratio = timeDiffBefore / totalTime;
     
-    double latitude = before->latitude + (after->latitude - before->latitude) * ratio;
-    double longitude = before->longitude + (after->longitude - before->longitude) * ratio;
+    double latitude = m_latitudes[beforeIndex] +
+                      (m_latitudes[afterIndex] - m_latitudes[beforeIndex]) * ratio;
+    double longitude = m_longitudes[beforeIndex] +
+                       (m_longitudes[afterIndex] - m_longitudes[beforeIndex]) * ratio;
     
-    std::optional<double> elevation;
-    if (before->elevation.has_value() && after->elevation.has_value()) {
-        elevation = before->elevation.value() + 
-                   (after->elevation.value() - before->elevation.value()) * ratio;
-    }
+    // A missing elevation on either side propagates as NaN
+    double elevation = m_elevations[beforeIndex] +
+                       (m_elevations[afterIndex] - m_elevations[beforeIndex]) * ratio;
     
-    return std::make_tuple(latitude, longitude, elevation);
+    return std::make_tuple(latitude, longitude, toElevation(elevation));
 }
 
 bool GpsMatcher::isWithinTrackRange(const QDateTime& time) const
 {
-    if (m_trackpoints.isEmpty()) {
+    if (m_times.isEmpty()) {
         return false;
     }
-    return time >= m_trackpoints.first().timestamp && 
-           time <= m_trackpoints.last().timestamp;
+    return time >= m_startTime && time <= m_endTime;
 }
 
 std::pair<QDateTime, QDateTime> GpsMatcher::trackTimeRange() const
 {
-    if (m_trackpoints.isEmpty()) {
-        return {QDateTime(), QDateTime()};
-    }
-    return {m_trackpoints.first().timestamp, m_trackpoints.last().timestamp};
+    return {m_startTime, m_endTime};
 }
 
 } // namespace lyp
@@ -7,6 +7,11 @@
 
 namespace lyp {
 
+/**
+ * @brief Matched (latitude, longitude, optional elevation), or nullopt if no match.
+ */
+using GpsMatch = std::optional<std::tuple<double, double, std::optional<double>>>;
+
 /**
  * @brief Matches photo timestamps with GPS trackpoints.
  * 
@@ -25,12 +30,15 @@ public:
                bool forceInterpolate = false);
     
     /**
-     * @brief Find GPS coordinates for a photo timestamp.
-     * @param photoTime Photo capture time (UTC)
-     * @return Tuple of (latitude, longitude, optional elevation) or nullopt if no match
+     * @brief Find GPS coordinates for photo timestamps.
+     *
+     * All photos are matched in one call so the lookups run back to back
+     * over the trackpoint arrays.
+     * @param photoTimes Photo capture times (UTC); invalid times never match
+     * @return One (latitude, longitude, optional elevation) tuple or nullopt
+     * per input timestamp, in the same order
      */
-    std::optional<std::tuple<double, double, std::optional<double>>> 
-    findGpsForPhoto(const QDateTime& photoTime) const;
+    QVector<GpsMatch> findGpsForPhotos(const QVector<QDateTime>& photoTimes) const;
     
     /**
      * @brief Check if a timestamp is within the GPX track time range.
@@ -46,7 +54,15 @@ public:
     std::pair<QDateTime, QDateTime> trackTimeRange() const;
 
 private:
-    QVector<TrackPoint> m_trackpoints;
+    GpsMatch matchAt(double photoSeconds) const;
+    
+    // Trackpoints stored as parallel arrays, sorted by time
+    QVector<double> m_times;  // Seconds since epoch
+    QVector<double> m_latitudes;
+    QVector<double> m_longitudes;
+    QVector<double> m_elevations;  // NaN where the trackpoint has none
+    QDateTime m_startTime;
+    QDateTime m_endTime;
     double m_maxTimeDiff;
     bool m_forceInterpolate;
 };
@@ -1,92 +1,319 @@
 #include "gpx_parser.h"
-#include <pugixml.hpp>
 #include <QFile>
 #include <QDebug>
 #include <QTimeZone>
+#include <QXmlStreamReader>
+#include <QtConcurrent>
 #include <algorithm>
+#include <cstring>
+#include <optional>
 
 namespace lyp {
 
 QString GpxParser::s_lastError;
 
-QVector<TrackPoint> GpxParser::parse(const QString& filePath)
+namespace {
+
+// Read one <trkpt>; the reader is left at its end element
+TrackPoint readTrackPoint(QXmlStreamReader& xml)
 {
-    s_lastError.clear();
-    QVector<TrackPoint> trackpoints;
+    TrackPoint point;
     
-    pugi::xml_document doc;
-    pugi::xml_parse_result result = doc.load_file(filePath.toUtf8().constData());
+    // Parse latitude and longitude (required attributes)
+    const QXmlStreamAttributes attributes = xml.attributes();
+    point.latitude = attributes.value(QLatin1String("lat")).toDouble();
+    point.longitude = attributes.value(QLatin1String("lon")).toDouble();
     
-    if (!result) {
-        s_lastError = QString("Failed to parse GPX file: %1").arg(result.description());
-        qWarning() << s_lastError;
-        return trackpoints;
+    while (xml.readNextStartElement()) {
+        if (xml.name() == QLatin1String("time")) {
+            // Parse timestamp (child element)
+            QString timeStr = xml.readElementText().trimmed();
+            // GPX uses ISO 8601 format: 2025-12-01T07:35:10Z or with offset
+            QDateTime timestamp = QDateTime::fromString(timeStr, Qt::ISODate);
+            if (!timestamp.isValid()) {
+                // Try alternative format without 'T'
+                timestamp = QDateTime::fromString(timeStr, "yyyy-MM-dd HH:mm:ss");
+            }
+            if (timestamp.isValid()) {
+                // Ensure UTC, then keep only the epoch seconds
+                timestamp.setTimeZone(QTimeZone::utc());
+                point.time = timestamp.toMSecsSinceEpoch() / 1000.0;
+            }
+        } else if (xml.name() == QLatin1String("ele")) {
+            // Parse elevation (optional child element)
+            bool ok = false;
+            double elevation = xml.readElementText().toDouble(&ok);
+            if (ok) {
+                point.elevation = elevation;
+            }
+        } else {
+            xml.skipCurrentElement();
+        }
     }
     
-    // GPX root element
-    pugi::xml_node gpx = doc.child("gpx");
-    if (!gpx) {
-        s_lastError = "Invalid GPX file: missing <gpx> root element";
-        qWarning() << s_lastError;
-        return trackpoints;
+    return point;
+}
+
+// Read the segments of the current <trk>; the reader is left at its end element
+void readTrack(QXmlStreamReader& xml, QVector<TrackPoint>& trackpoints)
+{
+    // Iterate through track segments
+    while (xml.readNextStartElement()) {
+        if (xml.name() != QLatin1String("trkseg")) {
+            xml.skipCurrentElement();
+            continue;
+        }
+        // Iterate through track points
+        while (xml.readNextStartElement()) {
+            if (xml.name() != QLatin1String("trkpt")) {
+                xml.skipCurrentElement();
+                continue;
+            }
+            TrackPoint point = readTrackPoint(xml);
+            
+            // Only add valid points with timestamps
+            if (point.isValid()) {
+                trackpoints.append(point);
+            }
+        }
+    }
+}
+
+// Files above this size are split by track and parsed on the thread pool
+constexpr qint64 kParallelParseThreshold = 10 * 1024 * 1024;
+
+bool startsWithAt(const QByteArray& data, qsizetype pos, const char* token)
+{
+    const qsizetype length = qstrlen(token);
+    return pos + length <= data.size() &&
+           std::memcmp(data.constData() + pos, token, length) == 0;
+}
+
+// Length of the element name starting at pos
+qsizetype nameLength(const QByteArray& data, qsizetype pos)
+{
+    qsizetype end = pos;
+    while (end < data.size()) {
+        const char c = data.at(end);
+        if (c == ' ' || c == '\t' || c == '\r' || c == '\n' || c == '/' || c == '>') {
+            break;
+        }
+        ++end;
+    }
+    return end - pos;
+}
+
+bool nameIs(const QByteArray& data, qsizetype pos, qsizetype length, const char* name)
+{
+    return length == static_cast<qsizetype>(qstrlen(name)) &&
+           std::memcmp(data.constData() + pos, name, length) == 0;
+}
+
+// Find the '>' closing the tag that starts at pos, skipping quoted values
+qsizetype findTagEnd(const QByteArray& data, qsizetype pos)
+{
+    char quote = 0;
+    for (qsizetype i = pos + 1; i < data.size(); ++i) {
+        const char c = data.at(i);
+        if (quote) {
+            if (c == quote) {
+                quote = 0;
+            }
+        } else if (c == '"' || c == '\'') {
+            quote = c;
+        } else if (c == '>') {
+            return i;
+        }
+    }
+    return -1;
+}
+
+// Cut out each <trk> child of <gpx> as its own XML document, with the file's
+// XML declaration in front so the encoding carries over. Returns nullopt if
+// the file cannot be split cleanly; the caller then parses it serially.
+std::optional<QVector<QByteArray>> splitTracks(const QByteArray& data)
+{
+    // Keep the XML declaration, and any byte order mark before it
+    QByteArray prolog;
+    const qsizetype declStart = data.indexOf("<?xml");
+    if (declStart >= 0 && declStart <= 3) {
+        const qsizetype declEnd = data.indexOf("?>", declStart);
+        if (declEnd < 0) {
+            return std::nullopt;
+        }
+        prolog = data.left(declEnd + 2);
     }
     
-    // Iterate through all tracks
-    for (pugi::xml_node trk : gpx.children("trk")) {
-        // Iterate through track segments
-        for (pugi::xml_node trkseg : trk.children("trkseg")) {
-            // Iterate through track points
-            for (pugi::xml_node trkpt : trkseg.children("trkpt")) {
-                TrackPoint point;
-                
-                // Parse latitude and longitude (required attributes)
-                point.latitude = trkpt.attribute("lat").as_double(0.0);
-                point.longitude = trkpt.attribute("lon").as_double(0.0);
-                
-                // Parse timestamp (child element)
-                pugi::xml_node timeNode = trkpt.child("time");
-                if (timeNode) {
-                    QString timeStr = QString::fromUtf8(timeNode.text().get());
-                    // GPX uses ISO 8601 format: 2025-12-01T07:35:10Z or with offset
-                    point.timestamp = QDateTime::fromString(timeStr, Qt::ISODate);
-                    if (!point.timestamp.isValid()) {
-                        // Try alternative format without 'T'
-                        point.timestamp = QDateTime::fromString(timeStr, "yyyy-MM-dd HH:mm:ss");
-                    }
-                    // Ensure UTC
-                    point.timestamp.setTimeZone(QTimeZone::utc());
-                }
-                
-                // Parse elevation (optional child element)
-                pugi::xml_node eleNode = trkpt.child("ele");
-                if (eleNode) {
-                    point.elevation = eleNode.text().as_double();
+    QVector<QByteArray> chunks;
+    int depth = 0;
+    qsizetype trackStart = -1;
+    qsizetype pos = prolog.size();
+    while ((pos = data.indexOf('<', pos)) >= 0) {
+        // Markup that may contain "<trk" without being a track
+        if (startsWithAt(data, pos, "<!--") || startsWithAt(data, pos, "<![CDATA[") ||
+            startsWithAt(data, pos, "<?")) {
+            const char* terminator = data.at(pos + 1) == '?' ? "?>"
+                                   : data.at(pos + 2) == '-' ? "-->" : "]]>";
+            const qsizetype end = data.indexOf(terminator, pos);
+            if (end < 0) {
+                return std::nullopt;
+            }
+            pos = end + qstrlen(terminator);
+            continue;
+        }
+        // A DOCTYPE may declare entities the chunks could not resolve
+        if (startsWithAt(data, pos, "<!")) {
+            return std::nullopt;
+        }
+        
+        const qsizetype end = findTagEnd(data, pos);
+        if (end < 0) {
+            return std::nullopt;
+        }
+        if (data.at(pos + 1) == '/') {
+            --depth;
+            if (depth == 1 && trackStart >= 0) {
+                chunks.append(prolog + data.mid(trackStart, end + 1 - trackStart));
+                trackStart = -1;
+            }
+        } else if (data.at(end - 1) != '/') {
+            const qsizetype length = nameLength(data, pos + 1);
+            if (depth == 0 && !nameIs(data, pos + 1, length, "gpx")) {
+                return std::nullopt;
+            }
+            if (depth == 1) {
+                // Prefixed names would need the root's namespace declarations
+                if (std::memchr(data.constData() + pos + 1, ':', length)) {
+                    return std::nullopt;
                 }
-                
-                // Only add valid points with timestamps
-                if (point.isValid() && point.timestamp.isValid()) {
-                    trackpoints.append(point);
+                if (nameIs(data, pos + 1, length, "trk")) {
+                    trackStart = pos;
                 }
             }
+            ++depth;
         }
+        pos = end + 1;
+    }
+    
+    if (depth != 0 || trackStart >= 0) {
+        return std::nullopt;
+    }
+    return chunks;
+}
+
+struct TrackChunkResult {
+    QVector<TrackPoint> trackpoints;
+    bool clean = false;  // The chunk was exactly one well-formed <trk>
+};
+
+TrackChunkResult parseTrackChunk(const QByteArray& chunk)
+{
+    TrackChunkResult result;
+    QXmlStreamReader xml(chunk);
+    // Prefixes such as gpxtpx: are declared on the <gpx> root, not here
+    xml.setNamespaceProcessing(false);
+    if (!xml.readNextStartElement() || xml.name() != QLatin1String("trk")) {
+        return result;
     }
+    readTrack(xml, result.trackpoints);
     
+    // The reader must stop at this track's end tag with nothing after it
+    if (!xml.isEndElement() || xml.name() != QLatin1String("trk")) {
+        return result;
+    }
+    while (!xml.atEnd()) {
+        xml.readNext();
+    }
+    result.clean = !xml.hasError();
+    return result;
+}
+
+// Sort merged trackpoints by time and log a summary
+QVector<TrackPoint> finishParse(QVector<TrackPoint>& trackpoints, const QString& filePath)
+{
     // Sort by timestamp
     std::sort(trackpoints.begin(), trackpoints.end(), 
         [](const TrackPoint& a, const TrackPoint& b) {
-            return a.timestamp < b.timestamp;
+            return a.time < b.time;
         });
     
     qInfo() << "Parsed" << trackpoints.size() << "trackpoints from" << filePath;
     
     if (!trackpoints.isEmpty()) {
-        qInfo() << "Time range:" << trackpoints.first().timestamp 
-                << "to" << trackpoints.last().timestamp;
+        qInfo() << "Time range:" << trackpoints.first().timestamp() 
+                << "to" << trackpoints.last().timestamp();
     }
     
     return trackpoints;
 }
 
+} // namespace
+
+QVector<TrackPoint> GpxParser::parse(const QString& filePath)
+{
+    s_lastError.clear();
+    QVector<TrackPoint> trackpoints;
+    
+    QFile file(filePath);
+    if (!file.open(QIODevice::ReadOnly)) {
+        s_lastError = QString("Failed to open GPX file: %1").arg(file.errorString());
+        qWarning() << s_lastError;
+        return trackpoints;
+    }
+    
+    // Large multi-track files: parse each <trk> on its own thread
+    if (file.size() > kParallelParseThreshold) {
+        const QByteArray data = file.readAll();
+        const std::optional<QVector<QByteArray>> chunks = splitTracks(data);
+        if (chunks.has_value() && chunks->size() > 1) {
+            const QVector<TrackChunkResult> results =
+                QtConcurrent::blockingMapped(*chunks, parseTrackChunk);
+            const bool clean = std::all_of(results.cbegin(), results.cend(),
+                [](const TrackChunkResult& result) { return result.clean; });
+            if (clean) {
+                for (const TrackChunkResult& result : results) {
+                    trackpoints.append(result.trackpoints);
+                }
+                return finishParse(trackpoints, filePath);
+            }
+            // Otherwise the serial parse below decides, and reports any error
+        }
+        file.seek(0);
+    }
+    
+    // Stream through the file instead of building a DOM; only the
+    // trackpoint fields are kept
+    QXmlStreamReader xml(&file);
+    
+    // GPX root element
+    if (!xml.readNextStartElement() || xml.name() != QLatin1String("gpx")) {
+        if (xml.hasError()) {
+            s_lastError = QString("Failed to parse GPX file: %1").arg(xml.errorString());
+        } else {
+            s_lastError = "Invalid GPX file: missing <gpx> root element";
+        }
+        qWarning() << s_lastError;
+        return trackpoints;
+    }
+    
+    // Iterate through all tracks
+    while (xml.readNextStartElement()) {
+        if (xml.name() != QLatin1String("trk")) {
+            xml.skipCurrentElement();
+            continue;
+        }
+        readTrack(xml, trackpoints);
+    }
+    
+    if (xml.hasError()) {
+        s_lastError = QString("Failed to parse GPX file: %1").arg(xml.errorString());
+        qWarning() << s_lastError;
+        return {};
+    }
+    
+    return finishParse(trackpoints, filePath);
+}
+
 double GpxParser::calculateAverageInterval(const QVector<TrackPoint>& trackpoints)
 {
     if (trackpoints.size() < 2) {
@@ -97,8 +324,7 @@ double GpxParser::calculateAverageInterval(const QVector<TrackPoint>& trackpoint
     int count = 0;
     
     for (int i = 1; i < trackpoints.size(); ++i) {
-        qint64 msecs = trackpoints[i - 1].timestamp.msecsTo(trackpoints[i].timestamp);
-        double seconds = msecs / 1000.0;
+        double seconds = trackpoints[i].time - trackpoints[i - 1].time;
         if (seconds > 0) {
             totalSeconds += seconds;
             ++count;
@@ -0,0 +1,7 @@
+#include "logging.h"
+
+namespace lyp {
+
+Q_LOGGING_CATEGORY(lcPhoto, "lyp.photo", QtInfoMsg)
+
+} // namespace lyp
@@ -0,0 +1,15 @@
+#pragma once
+
+#include <QLoggingCategory>
+
+namespace lyp {
+
+/**
+ * @brief Per-photo log messages.
+ *
+ * Off by default so large batches don't log a line per file from every
+ * worker thread; enable with QT_LOGGING_RULES="lyp.photo.debug=true".
+ */
+Q_DECLARE_LOGGING_CATEGORY(lcPhoto)
+
+} // namespace lyp
@@ -1,16 +1,92 @@
 #include "photo_processor.h"
 #include "exif_handler.h"
+#include "exiftool_daemon.h"
 #include "exiftool_writer.h"
 #include "gps_matcher.h"
 #include "gpx_parser.h"
+#include "logging.h"
 #include "models/photo_list_model.h"
 #include <QDebug>
+#include <QDir>
 #include <QFileInfo>
+#include <QSet>
+#include <QThread>
+#include <QtConcurrent>
 #include <algorithm>
 
 namespace lyp {
 
-PhotoProcessor::PhotoProcessor(QObject *parent) : QObject(parent) {}
+namespace {
+
+// Phase 1 for one photo: mark it skipped, or leave it in the Processing
+// state. Metadata was read when the photo was scanned.
+void checkPhoto(PhotoItem &photo, const ProcessingSettings &settings) {
+  photo.state = PhotoState::Processing;
+
+  // Skip files with no metadata support
+  if (ExifHandler::getFormatInfo(photo.filePath).level ==
+      FormatSupportLevel::Minimal) {
+    photo.state = PhotoState::Skipped;
+    photo.errorMessage = "No metadata support for this format";
+    return;
+  }
+
+  // Skip if already has GPS and not overwriting
+  if (photo.hasExistingGps && !settings.overwriteExistingGps) {
+    photo.state = PhotoState::Skipped;
+    photo.errorMessage = "Already has GPS data";
+    return;
+  }
+
+  if (!photo.captureTime.isValid()) {
+    photo.state = PhotoState::Skipped;
+    photo.errorMessage = "No timestamp found";
+  }
+}
+
+// Phase 3 for one photo: write the matched coordinates and return the photo
+// with its final state. Runs on worker threads for exiv2 formats.
+PhotoItem writePhotoGps(PhotoItem photo) {
+  double lat = photo.matchedLat.value();
+  double lon = photo.matchedLon.value();
+
+  if (ExifHandler::getFormatInfo(photo.filePath).level ==
+      FormatSupportLevel::NeedsExifTool) {
+    // Use exiftool for BMFF formats
+    if (!ExifToolWriter::isAvailable()) {
+      photo.state = PhotoState::Error;
+      photo.errorMessage =
+          "exiftool not found - install it to write to this format";
+      return photo;
+    }
+    if (!ExifToolWriter::writeGpsData(photo.filePath, lat, lon,
+                                      photo.matchedElevation)) {
+      photo.state = PhotoState::Error;
+      photo.errorMessage = ExifToolWriter::lastError();
+      return photo;
+    }
+  } else {
+    // Use exiv2 for FullWrite and DangerousRAW formats
+    if (!ExifHandler::writeGpsData(photo.filePath, lat, lon,
+                                   photo.matchedElevation)) {
+      photo.state = PhotoState::Error;
+      photo.errorMessage = ExifHandler::lastError();
+      return photo;
+    }
+  }
+
+  photo.state = PhotoState::Success;
+  return photo;
+}
+
+} // namespace
+
+PhotoProcessor::PhotoProcessor(QObject *parent) : QObject(parent) {
+  // Metadata reads and GPX parsing are CPU-bound and use the global pool,
+  // which Qt sizes to idealThreadCount(). Writes mostly wait on disk, so
+  // they get their own pool that is allowed to oversubscribe.
+  m_writePool.setMaxThreadCount(QThread::idealThreadCount() * 2);
+}
 
 bool PhotoProcessor::loadGpxFile(const QString &filePath) {
   m_trackpoints = GpxParser::parse(filePath);
@@ -34,31 +110,70 @@ bool PhotoProcessor::loadGpxFile(const QString &filePath) {
 void PhotoProcessor::scanPhotos(const QStringList &filePaths,
                                 PhotoListModel *model) {
   QVector<PhotoItem> items;
+  int skippedUnsupported = 0;
   int skippedDuplicates = 0;
 
+  QSet<QString> knownPaths;
+  for (const PhotoItem &photo : model->photos()) {
+    knownPaths.insert(photo.filePath);
+  }
+
   for (const QString &path : filePaths) {
     if (!ExifHandler::isSupported(path)) {
-      qInfo() << "Skipping unsupported file:" << path;
+      qCDebug(lcPhoto) << "Skipping unsupported file:" << path;
+      ++skippedUnsupported;
       continue;
     }
 
     // Skip duplicates
-    if (model->containsFile(path)) {
-      qInfo() << "Skipping duplicate file:" << path;
+    if (knownPaths.contains(path)) {
+      qCDebug(lcPhoto) << "Skipping duplicate file:" << path;
       ++skippedDuplicates;
       continue;
     }
+    knownPaths.insert(path);
 
     PhotoItem item;
     item.filePath = path;
     item.fileName = QFileInfo(path).fileName();
-    item.hasExistingGps = ExifHandler::hasGpsData(path);
     item.state = PhotoState::Pending;
 
     items.append(item);
   }
 
+  // Read capture time and GPS state once per photo: exiftool formats in one
+  // batch, everything else with exiv2 on the thread pool
+  QStringList exiftoolPaths;
+  for (const PhotoItem &item : items) {
+    if (ExifHandler::getFormatInfo(item.filePath).level ==
+        FormatSupportLevel::NeedsExifTool) {
+      exiftoolPaths.append(QDir::cleanPath(item.filePath));
+    }
+  }
+  const QHash<QString, PhotoMetadata> preloaded =
+      ExifToolWriter::readMetadata(exiftoolPaths);
+  ExifToolDaemon::instance().shutdown();
+
+  auto readMetadata = [&preloaded](PhotoItem &item) {
+    PhotoMetadata metadata;
+    auto preloadedIt = preloaded.constFind(QDir::cleanPath(item.filePath));
+    if (preloadedIt != preloaded.constEnd()) {
+      metadata = preloadedIt.value();
+    } else if (ExifHandler::getFormatInfo(item.filePath).level !=
+               FormatSupportLevel::Minimal) {
+      metadata = ExifHandler::readPhotoMetadata(item.filePath);
+    }
+    item.hasExistingGps = metadata.hasGps;
+    if (metadata.captureTime.has_value()) {
+      item.captureTime = metadata.captureTime.value();
+    }
+  };
+  QtConcurrent::blockingMap(items, readMetadata);
+
   model->addPhotos(items);
+  if (skippedUnsupported > 0) {
+    qInfo() << "Skipped" << skippedUnsupported << "unsupported file(s)";
+  }
   if (skippedDuplicates > 0) {
     qInfo() << "Skipped" << skippedDuplicates << "duplicate file(s)";
   }
@@ -92,119 +207,120 @@ void PhotoProcessor::processPhotos(PhotoListModel *model,
           << "forceInterpolate=" << settings.forceInterpolate
           << "dryRun=" << settings.dryRun;
 
+  QVector<PhotoItem> photos = model->photos();
+  const int totalCount = photos.size();
+  int doneCount = 0;
   int successCount = 0;
-
-  for (int i = 0; i < model->count(); ++i) {
-    if (m_stopRequested) {
-      qInfo() << "Processing stopped by user";
-      break;
+  int skippedCount = 0;
+  QStringList failures; // Reported together once the run is over
+  auto finishPhoto = [&](int index, const PhotoItem &photo) {
+    bool success = photo.state == PhotoState::Success;
+    model->updatePhoto(index, photo);
+    emit photoProcessed(index, success);
+    emit progressUpdated(++doneCount, totalCount);
+    if (success) {
+      ++successCount;
+    } else if (photo.state == PhotoState::Skipped) {
+      ++skippedCount;
+    } else if (photo.state == PhotoState::Error) {
+      failures.append(photo.fileName + ": " + photo.errorMessage);
     }
+  };
 
-    emit progressUpdated(i + 1, model->count());
-
-    PhotoItem photo = model->photos()[i];
-    photo.state = PhotoState::Processing;
-    model->updatePhoto(i, photo);
-
-    // Check format support level
-    FormatInfo formatInfo = ExifHandler::getFormatInfo(photo.filePath);
-
-    // Skip files with no metadata support
-    if (formatInfo.level == FormatSupportLevel::Minimal) {
-      photo.state = PhotoState::Skipped;
-      photo.errorMessage = "No metadata support for this format";
-      model->updatePhoto(i, photo);
-      emit photoProcessed(i, false);
-      continue;
-    }
-
-    // Skip if already has GPS and not overwriting
-    if (photo.hasExistingGps && !settings.overwriteExistingGps) {
-      photo.state = PhotoState::Skipped;
-      photo.errorMessage = "Already has GPS data";
-      model->updatePhoto(i, photo);
-      emit photoProcessed(i, false);
-      continue;
-    }
+  // Phase 1: drop photos that cannot or should not be tagged. Capture times
+  // and GPS state were read when the photos were scanned.
+  for (PhotoItem &photo : photos) {
+    checkPhoto(photo, settings);
+  }
 
-    // Get photo timestamp
-    auto timestamp =
-        ExifHandler::getPhotoTimestamp(photo.filePath, timeOffsetSeconds);
-    if (!timestamp.has_value()) {
-      photo.state = PhotoState::Skipped;
-      photo.errorMessage = "No timestamp found";
-      model->updatePhoto(i, photo);
-      emit photoProcessed(i, false);
-      continue;
+  // Phase 2: match all remaining photos against the track at once
+  QVector<int> candidates;
+  QVector<QDateTime> captureTimes;
+  for (int i = 0; i < totalCount; ++i) {
+    if (photos[i].state == PhotoState::Processing) {
+      candidates.append(i);
+      // Convert from camera clock to UTC
+      captureTimes.append(photos[i].captureTime.addSecs(
+          static_cast<qint64>(-timeOffsetSeconds)));
     }
+  }
+  const QVector<GpsMatch> matches = matcher.findGpsForPhotos(captureTimes);
 
-    photo.captureTime = timestamp.value();
-
-    // Find GPS coordinates
-    auto gpsResult = matcher.findGpsForPhoto(photo.captureTime);
-    if (!gpsResult.has_value()) {
+  for (int k = 0; k < candidates.size(); ++k) {
+    PhotoItem &photo = photos[candidates[k]];
+    if (!matches[k].has_value()) {
       photo.state = PhotoState::Skipped;
-      if (matcher.isWithinTrackRange(photo.captureTime)) {
+      if (matcher.isWithinTrackRange(captureTimes[k])) {
         photo.errorMessage = "No GPS match within time threshold";
       } else {
         photo.errorMessage = "Photo time outside GPX range";
       }
-      model->updatePhoto(i, photo);
-      emit photoProcessed(i, false);
       continue;
     }
 
-    auto [lat, lon, elevation] = gpsResult.value();
+    auto [lat, lon, elevation] = matches[k].value();
     photo.matchedLat = lat;
     photo.matchedLon = lon;
     photo.matchedElevation = elevation;
 
-    // Write GPS data (unless dry run)
-    if (!settings.dryRun) {
-      bool writeSuccess = false;
-
-      if (formatInfo.level == FormatSupportLevel::NeedsExifTool) {
-        // Use exiftool for BMFF formats
-        if (!ExifToolWriter::isAvailable()) {
-          photo.state = PhotoState::Error;
-          photo.errorMessage =
-              "exiftool not found - install it to write to this format";
-          model->updatePhoto(i, photo);
-          emit photoProcessed(i, false);
-          continue;
-        }
-        writeSuccess =
-            ExifToolWriter::writeGpsData(photo.filePath, lat, lon, elevation);
-        if (!writeSuccess) {
-          photo.state = PhotoState::Error;
-          photo.errorMessage = ExifToolWriter::lastError();
-          model->updatePhoto(i, photo);
-          emit photoProcessed(i, false);
-          continue;
-        }
-      } else {
-        // Use exiv2 for FullWrite and DangerousRAW formats
-        writeSuccess =
-            ExifHandler::writeGpsData(photo.filePath, lat, lon, elevation);
-        if (!writeSuccess) {
-          photo.state = PhotoState::Error;
-          photo.errorMessage = ExifHandler::lastError();
-          model->updatePhoto(i, photo);
-          emit photoProcessed(i, false);
-          continue;
-        }
-      }
+    // Nothing left to do in a dry run
+    if (settings.dryRun) {
+      photo.state = PhotoState::Success;
+    }
+  }
+
+  // Report everything that is already settled
+  QVector<int> exiftoolWrites;
+  QVector<int> poolWrites;
+  QVector<PhotoItem> poolPhotos;
+  for (int i = 0; i < totalCount; ++i) {
+    if (photos[i].state != PhotoState::Processing) {
+      finishPhoto(i, photos[i]);
+    } else if (ExifHandler::getFormatInfo(photos[i].filePath).level ==
+               FormatSupportLevel::NeedsExifTool) {
+      exiftoolWrites.append(i);
+    } else {
+      poolWrites.append(i);
+      poolPhotos.append(photos[i]);
+    }
+  }
+
+  // Phase 3: write GPS data. exiv2 writes run on the thread pool while
+  // exiftool writes go through the shared daemon on this thread.
+  QFuture<PhotoItem> future =
+      QtConcurrent::mapped(&m_writePool, poolPhotos, writePhotoGps);
+
+  for (int index : exiftoolWrites) {
+    if (m_stopRequested) {
+      break;
     }
+    model->updatePhoto(index, photos[index]);
+    finishPhoto(index, writePhotoGps(photos[index]));
+  }
+
+  for (int k = 0; k < poolWrites.size(); ++k) {
+    if (m_stopRequested) {
+      future.cancel();
+      break;
+    }
+    finishPhoto(poolWrites[k], future.resultAt(k));
+  }
+  future.waitForFinished();
 
-    photo.state = PhotoState::Success;
-    model->updatePhoto(i, photo);
-    emit photoProcessed(i, true);
-    ++successCount;
+  if (m_stopRequested) {
+    qInfo() << "Processing stopped by user";
   }
 
-  qInfo() << "Processing complete:" << successCount << "/" << model->count()
-          << "photos updated";
-  emit processingComplete(successCount, model->count());
+  // Release the exiftool process until the next run
+  ExifToolDaemon::instance().shutdown();
+
+  qInfo() << "Processing complete:" << successCount << "/" << totalCount
+          << "photos updated," << skippedCount << "skipped,"
+          << failures.size() << "failed";
+  for (const QString &failure : failures) {
+    qWarning().noquote() << "Failed:" << failure;
+  }
+  emit processingComplete(successCount, totalCount);
 }
 
 void PhotoProcessor::stopProcessing() { m_stopRequested = true; }
@@ -5,6 +5,7 @@
 #include <QObject>
 #include <QVector>
 #include <QFuture>
+#include <QThreadPool>
 
 namespace lyp {
 
@@ -112,6 +113,7 @@ private:
     QVector<TrackPoint> m_trackpoints;
     QString m_gpxFilePath;
     bool m_stopRequested = false;
+    QThreadPool m_writePool;  // EXIF writes, I/O-bound
 };
 
 } // namespace lyp
@@ -1,9 +1,16 @@
 #include "ui/main_window.h"
 #include <QApplication>
 #include <QDebug>
+#include <cstdlib>
+#include <exiv2/exiv2.hpp>
 
 int main(int argc, char* argv[])
 {
+    // Photos are processed on worker threads; exiv2's XMP support must be
+    // initialized before any of them touch metadata
+    Exiv2::XmpParser::initialize();
+    std::atexit(Exiv2::XmpParser::terminate);
+    
     QApplication app(argc, argv);
     
     app.setApplicationName("LocateYourPhoto");
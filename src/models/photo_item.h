@@ -23,7 +23,7 @@ enum class PhotoState {
 struct PhotoItem {
     QString filePath;
     QString fileName;
-    QDateTime captureTime;
+    QDateTime captureTime;  // Camera clock from EXIF, no time offset applied
     bool hasExistingGps = false;
     PhotoState state = PhotoState::Pending;
     QString errorMessage;
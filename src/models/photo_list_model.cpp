@@ -115,13 +115,4 @@ void PhotoListModel::resetAllStates() {
   emit dataChanged(createIndex(0, 0), createIndex(m_photos.size() - 1, 0));
 }
 
-bool PhotoListModel::containsFile(const QString &filePath) const {
-  for (const PhotoItem &photo : m_photos) {
-    if (photo.filePath == filePath) {
-      return true;
-    }
-  }
-  return false;
-}
-
 } // namespace lyp
@@ -1,6 +1,9 @@
 #pragma once
 
 #include <QDateTime>
+#include <QTimeZone>
+#include <cmath>
+#include <limits>
 #include <optional>
 
 namespace lyp {
@@ -9,13 +12,19 @@ namespace lyp {
  * @brief Represents a GPS trackpoint from a GPX file.
  */
 struct TrackPoint {
-    QDateTime timestamp;
+    // Seconds since the Unix epoch (UTC); NaN if the point has no time
+    double time = std::numeric_limits<double>::quiet_NaN();
     double latitude = 0.0;
     double longitude = 0.0;
     std::optional<double> elevation;
     
+    QDateTime timestamp() const {
+        return QDateTime::fromMSecsSinceEpoch(std::llround(time * 1000.0),
+                                              QTimeZone::utc());
+    }
+    
     bool isValid() const {
-        return timestamp.isValid() && 
+        return !std::isnan(time) && 
                latitude >= -90.0 && latitude <= 90.0 &&
                longitude >= -180.0 && longitude <= 180.0;
     }